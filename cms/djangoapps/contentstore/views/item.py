@@ -5,7 +5,6 @@ import hashlib
 import logging
 from uuid import uuid4
 
-from collections import OrderedDict
 from functools import partial
 from static_replace import replace_static_urls
 from xmodule_modifiers import wrap_xblock
@@ -38,6 +37,7 @@ from edxmako.shortcuts import render_to_string
 from models.settings.course_grading import CourseGradingModel
 from cms.lib.xblock.runtime import handler_url, local_resource_url
 from opaque_keys.edx.keys import UsageKey, CourseKey
+from request_cache.middleware import RequestCache
 
 __all__ = ['orphan_handler', 'xblock_handler', 'xblock_view_handler']
 
@@ -53,15 +53,58 @@ xmodule.x_module.descriptor_global_handler_url = handler_url
 xmodule.x_module.descriptor_global_local_resource_url = local_resource_url
 
 
+# Url resources are overwhelmingly the same handful of JS/CSS files rendered over and over,
+# so their hashes are remembered (up to a bound) instead of being recomputed on every view.
+# Inline resources are mostly unique per render, so caching them would just hold their text.
+_RESOURCE_HASH_CACHE = {}
+_RESOURCE_HASH_CACHE_SIZE = 4096
+
+
 def hash_resource(resource):
     """
     Hash a :class:`xblock.fragment.FragmentResource`.
     """
+    if resource.kind != 'url':
+        return _compute_resource_hash(resource)
+    resource_hash = _RESOURCE_HASH_CACHE.get(resource)
+    if resource_hash is None:
+        if len(_RESOURCE_HASH_CACHE) >= _RESOURCE_HASH_CACHE_SIZE:
+            _RESOURCE_HASH_CACHE.clear()
+        resource_hash = _RESOURCE_HASH_CACHE[resource] = _compute_resource_hash(resource)
+    return resource_hash
+
+
+def _compute_resource_hash(resource):
+    """
+    Compute the hash of a :class:`xblock.fragment.FragmentResource`.
+
+    The fields are fed to the digest one at a time rather than through repr(resource), so inline
+    resources aren't copied through string formatting first. The digest must stay stable across
+    processes, as the client uses it to skip resources it has already loaded.
+    """
     md5 = hashlib.md5()
-    md5.update(repr(resource))
+    for value in resource:
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        elif value is None:
+            value = ''
+        md5.update(value)
+        # separate the fields so that moving characters between adjacent fields changes the hash
+        md5.update('\x00')
     return md5.hexdigest()
 
 
+def _fill_in_run(course_key):
+    """
+    Returns the course_key with its run filled in (course_keys may be used without runs).
+    The result is remembered for the rest of the request, as most requests keep asking about the same course.
+    """
+    cache = RequestCache.get_request_cache().data.setdefault('fill_in_run', {})
+    if course_key not in cache:
+        cache[course_key] = modulestore().fill_in_run(course_key)
+    return cache[course_key]
+
+
 # pylint: disable=unused-argument
 @require_http_methods(("DELETE", "GET", "PUT", "POST"))
 @login_required
@@ -102,7 +145,7 @@ def xblock_handler(request, usage_key_string):
     if usage_key_string:
         usage_key = UsageKey.from_string(usage_key_string)
         # usage_key's course_key may have an empty run property
-        usage_key = usage_key.replace(course_key=modulestore().fill_in_run(usage_key.course_key))
+        usage_key = usage_key.replace(course_key=_fill_in_run(usage_key.course_key))
 
         if not has_course_access(request.user, usage_key.course_key):
             raise PermissionDenied()
@@ -140,12 +183,12 @@ def xblock_handler(request, usage_key_string):
             parent_usage_key = UsageKey.from_string(request.json['parent_locator'])
             # usage_key's course_key may have an empty run property
             parent_usage_key = parent_usage_key.replace(
-                course_key=modulestore().fill_in_run(parent_usage_key.course_key)
+                course_key=_fill_in_run(parent_usage_key.course_key)
             )
             duplicate_source_usage_key = UsageKey.from_string(request.json['duplicate_source_locator'])
             # usage_key's course_key may have an empty run property
             duplicate_source_usage_key = duplicate_source_usage_key.replace(
-                course_key=modulestore().fill_in_run(duplicate_source_usage_key.course_key)
+                course_key=_fill_in_run(duplicate_source_usage_key.course_key)
             )
 
             dest_usage_key = _duplicate_item(
@@ -179,7 +222,7 @@ def xblock_view_handler(request, usage_key_string, view_name):
     """
     usage_key = UsageKey.from_string(usage_key_string)
     # usage_key's course_key may have an empty run property
-    usage_key = usage_key.replace(course_key=modulestore().fill_in_run(usage_key.course_key))
+    usage_key = usage_key.replace(course_key=_fill_in_run(usage_key.course_key))
     if not has_course_access(request.user, usage_key.course_key):
         raise PermissionDenied()
 
@@ -248,13 +291,18 @@ def xblock_view_handler(request, usage_key_string, view_name):
         else:
             raise Http404
 
-        hashed_resources = OrderedDict()
+        # drop duplicate resources, keeping the first occurrence of each in order
+        seen_hashes = set()
+        hashed_resources = []
         for resource in fragment.resources:
-            hashed_resources[hash_resource(resource)] = resource
+            resource_hash = hash_resource(resource)
+            if resource_hash not in seen_hashes:
+                seen_hashes.add(resource_hash)
+                hashed_resources.append((resource_hash, resource))
 
         return JsonResponse({
             'html': fragment.content,
-            'resources': hashed_resources.items()
+            'resources': hashed_resources
         })
 
     else:
@@ -318,12 +366,12 @@ def _save_item(user, usage_key, data=None, children=None, metadata=None, nullout
         data = old_content['data'] if 'data' in old_content else None
 
     if children is not None:
-        children_usage_keys = []
-        for child in children:
-            child_usage_key = UsageKey.from_string(child)
-            child_usage_key = child_usage_key.replace(course_key=modulestore().fill_in_run(child_usage_key.course_key))
-            children_usage_keys.append(child_usage_key)
-        existing_item.children = children_usage_keys
+        # children live in the same course as their parent, whose course_key already has its run filled in
+        children_course_key = _fill_in_run(usage_key.course_key)
+        existing_item.children = [
+            UsageKey.from_string(child).replace(course_key=children_course_key)
+            for child in children
+        ]
 
     # also commit any metadata which might have been passed along
     if nullout is not None or metadata is not None:
@@ -378,7 +426,7 @@ def _save_item(user, usage_key, data=None, children=None, metadata=None, nullout
     # Make public after updating the xblock, in case the caller asked
     # for both an update and a publish.
     if publish and publish == 'make_public':
-        modulestore().publish(existing_item.location, user.id)
+        store.publish(existing_item.location, user.id)
 
     # Note that children aren't being returned until we have a use case.
     return JsonResponse(result)
@@ -390,7 +438,7 @@ def _create_item(request):
     """View for create items."""
     usage_key = UsageKey.from_string(request.json['parent_locator'])
     # usage_key's course_key may have an empty run property
-    usage_key = usage_key.replace(course_key=modulestore().fill_in_run(usage_key.course_key))
+    usage_key = usage_key.replace(course_key=_fill_in_run(usage_key.course_key))
     category = request.json['category']
 
     display_name = request.json.get('display_name')
@@ -399,62 +447,117 @@ def _create_item(request):
         raise PermissionDenied()
 
     store = modulestore()
-    parent = store.get_item(usage_key)
-    dest_usage_key = usage_key.replace(category=category, name=uuid4().hex)
-
-    # get the metadata, display_name, and definition from the request
-    metadata = {}
-    data = None
-    template_id = request.json.get('boilerplate')
-    if template_id:
-        clz = parent.runtime.load_block_type(category)
-        if clz is not None:
-            template = clz.get_template(template_id)
-            if template is not None:
-                metadata = template.get('metadata', {})
-                data = template.get('data')
-
-    if display_name is not None:
-        metadata['display_name'] = display_name
+    with store.bulk_write_operations(usage_key.course_key):
+        parent = store.get_item(usage_key)
+        dest_usage_key = usage_key.replace(category=category, name=uuid4().hex)
+
+        # get the metadata, display_name, and definition from the request
+        metadata = {}
+        data = None
+        template_id = request.json.get('boilerplate')
+        if template_id:
+            clz = parent.runtime.load_block_type(category)
+            if clz is not None:
+                template = clz.get_template(template_id)
+                if template is not None:
+                    metadata = template.get('metadata', {})
+                    data = template.get('data')
+
+        if display_name is not None:
+            metadata['display_name'] = display_name
+
+        created_block = store.create_and_save_xmodule(
+            dest_usage_key,
+            request.user.id,
+            definition_data=data,
+            metadata=metadata,
+            runtime=parent.runtime,
+        )
 
-    created_block = store.create_and_save_xmodule(
-        dest_usage_key,
-        request.user.id,
-        definition_data=data,
-        metadata=metadata,
-        runtime=parent.runtime,
-    )
+        # the parent is saved once at the end, whether it gained a child, a tab, or both
+        parent_changed = False
 
-    # VS[compat] cdodge: This is a hack because static_tabs also have references from the course module, so
-    # if we add one then we need to also add it to the policy information (i.e. metadata)
-    # we should remove this once we can break this reference from the course to static tabs
-    if category == 'static_tab':
-        course = store.get_course(dest_usage_key.course_key)
-        course.tabs.append(
-            StaticTab(
-                name=display_name,
-                url_slug=dest_usage_key.name,
+        # VS[compat] cdodge: This is a hack because static_tabs also have references from the course module, so
+        # if we add one then we need to also add it to the policy information (i.e. metadata)
+        # we should remove this once we can break this reference from the course to static tabs
+        if category == 'static_tab':
+            if parent.category == 'course':
+                course = parent
+                parent_changed = True
+            else:
+                course = store.get_course(dest_usage_key.course_key)
+            course.tabs.append(
+                StaticTab(
+                    name=display_name,
+                    url_slug=dest_usage_key.name,
+                )
             )
-        )
-        store.update_item(course, request.user.id)
+            if course is not parent:
+                store.update_item(course, request.user.id)
 
-    # TODO replace w/ nicer accessor
-    if not 'detached' in parent.runtime.load_block_type(category)._class_tags:
-        parent.children.append(created_block.location)
-        store.update_item(parent, request.user.id)
+        if not _is_detached(parent.runtime, category):
+            parent.children.append(created_block.location)
+            parent_changed = True
+
+        if parent_changed:
+            store.update_item(parent, request.user.id)
 
     return JsonResponse({"locator": unicode(created_block.location), "courseKey": unicode(created_block.location.course_key)})
 
 
+# Whether a block type is detached only depends on its class, which a runtime class always resolves the same way.
+# The categories come from the request, so the cache is cleared once full rather than left to grow.
+_DETACHED_CACHE = {}
+_DETACHED_CACHE_SIZE = 1024
+
+
+def _is_detached(runtime, category):
+    """
+    Returns true if xblocks of the given category are detached, i.e. are never children of another xblock.
+    """
+    key = (type(runtime), category)
+    if key not in _DETACHED_CACHE:
+        if len(_DETACHED_CACHE) >= _DETACHED_CACHE_SIZE:
+            _DETACHED_CACHE.clear()
+        # TODO replace w/ nicer accessor
+        _DETACHED_CACHE[key] = 'detached' in runtime.load_block_type(category)._class_tags
+    return _DETACHED_CACHE[key]
+
+
 def _duplicate_item(parent_usage_key, duplicate_source_usage_key, user, display_name=None):
     """
     Duplicate an existing xblock as a child of the supplied parent_usage_key.
     """
     store = modulestore()
-    source_item = store.get_item(duplicate_source_usage_key)
+    with store.bulk_write_operations(duplicate_source_usage_key.course_key):
+        # Load the whole source subtree up front so that walking the children below doesn't
+        # go back to the modulestore once per descendant.
+        source_item = store.get_item(duplicate_source_usage_key, depth=None)
+        dest_module = _duplicate_subtree(store, source_item, user, display_name)
+
+        if not _is_detached(source_item.runtime, dest_module.category):
+            parent = store.get_item(parent_usage_key)
+            # If source was already a child of the parent, add duplicate immediately afterward.
+            # Otherwise, add child to end.
+            if source_item.location in parent.children:
+                source_index = parent.children.index(source_item.location)
+                parent.children.insert(source_index + 1, dest_module.location)
+            else:
+                parent.children.append(dest_module.location)
+            store.update_item(parent, user.id)
+
+    return dest_module.location
+
+
+def _duplicate_subtree(store, source_item, user, display_name=None):
+    """
+    Create a copy of source_item and (recursively) of all of its descendants, and return the copy.
+
+    The copy is not attached to any parent; only the copied children lists within the subtree are
+    written, so each new block is saved at most twice regardless of the size of the subtree.
+    """
     # Change the blockID to be unique.
     dest_usage_key = source_item.location.replace(name=uuid4().hex)
-    category = dest_usage_key.block_type
 
     # Update the display name to indicate this is a duplicate (unless display name provided).
     duplicate_metadata = own_metadata(source_item)
@@ -468,8 +571,6 @@ def _duplicate_item(parent_usage_key, duplicate_source_usage_key, user, display_
 
     dest_module = store.create_and_save_xmodule(
         dest_usage_key,
-
-
         user.id,
         definition_data=source_item.get_explicitly_set_fields_by_scope(Scope.content),
         metadata=duplicate_metadata,
@@ -479,24 +580,16 @@ def _duplicate_item(parent_usage_key, duplicate_source_usage_key, user, display_
     # Children are not automatically copied over (and not all xblocks have a 'children' attribute).
     # Because DAGs are not fully supported, we need to actually duplicate each child as well.
     if source_item.has_children:
-        dest_module.children = []
-        for child in source_item.children:
-            dupe = _duplicate_item(dest_module.location, child, user=user)
-            dest_module.children.append(dupe)
+        # resolve the children through the runtime (which has the prefetched subtree) rather than
+        # get_children, so that a dangling child reference still fails the duplication rather than
+        # being silently left out of the copy
+        dest_module.children = [
+            _duplicate_subtree(store, source_item.runtime.get_block(child_loc), user).location
+            for child_loc in source_item.children
+        ]
         store.update_item(dest_module, user.id)
 
-    if not 'detached' in source_item.runtime.load_block_type(category)._class_tags:
-        parent = store.get_item(parent_usage_key)
-        # If source was already a child of the parent, add duplicate immediately afterward.
-        # Otherwise, add child to end.
-        if source_item.location in parent.children:
-            source_index = parent.children.index(source_item.location)
-            parent.children.insert(source_index + 1, dest_module.location)
-        else:
-            parent.children.append(dest_module.location)
-        store.update_item(parent, user.id)
-
-    return dest_module.location
+    return dest_module
 
 
 def _delete_item(usage_key, user):
@@ -539,11 +632,13 @@ def orphan_handler(request, course_key_string):
         if request.user.is_staff:
             store = modulestore()
             items = store.get_orphans(course_usage_key)
-            for itemloc in items:
-                # get_orphans returns the deprecated string format w/o revision
-                usage_key = course_usage_key.make_usage_key_from_deprecated_string(itemloc)
-                # need to delete all versions
-                store.delete_item(usage_key, request.user.id, revision=ModuleStoreEnum.RevisionOption.all)
+            # each delete otherwise recomputes the course's inheritance metadata; do that once at the end
+            with store.bulk_write_operations(course_usage_key):
+                for itemloc in items:
+                    # get_orphans returns the deprecated string format w/o revision
+                    usage_key = course_usage_key.make_usage_key_from_deprecated_string(itemloc)
+                    # need to delete all versions
+                    store.delete_item(usage_key, request.user.id, revision=ModuleStoreEnum.RevisionOption.all)
             return JsonResponse({'deleted': items})
         else:
             raise PermissionDenied()
@@ -16,6 +16,7 @@ from django.test.client import RequestFactory
 from django.core.urlresolvers import reverse
 from contentstore.utils import reverse_usage_url, reverse_course_url
 
+from contentstore.views.item import hash_resource
 from contentstore.views.component import (
     component_handler, get_component_templates,
     SPLIT_TEST_COMPONENT_TYPE
@@ -27,9 +28,11 @@ from xmodule.capa_module import CapaDescriptor
 from xmodule.modulestore import PublishState
 from xmodule.x_module import STUDIO_VIEW, STUDENT_VIEW
 from xblock.exceptions import NoSuchHandlerError
+from xblock.fragment import FragmentResource
 from opaque_keys.edx.keys import UsageKey, CourseKey
 from opaque_keys.edx.locations import Location
 from xmodule.partitions.partitions import Group, UserPartition
+from xmodule.tabs import StaticTab
 
 
 class ItemTest(CourseTestCase):
@@ -233,6 +236,23 @@ class TestCreateItem(ItemTest):
         self.assertEqual(problem.display_name, template['metadata']['display_name'])
         self.assertEqual(problem.markdown, template['metadata']['markdown'])
 
+    def test_create_static_tab(self):
+        """
+        Creating a static tab adds it to the course's tabs but not to its children
+        """
+        course = self.get_item_from_modulestore(self.usage_key)
+        children = list(course.children)
+
+        resp = self.create_xblock(display_name='Static tab', category='static_tab')
+        tab_usage_key = self.response_usage_key(resp)
+
+        course = self.get_item_from_modulestore(self.usage_key)
+        self.assertTrue(any(
+            isinstance(tab, StaticTab) and tab.url_slug == tab_usage_key.name and tab.name == 'Static tab'
+            for tab in course.tabs
+        ))
+        self.assertEqual(course.children, children)
+
     def test_create_item_negative(self):
         """
         Negative tests for create_item
@@ -1018,6 +1038,34 @@ class TestEditSplitModule(ItemTest):
         self.assertContains(resp, "module is disabled")
 
 
+class TestHashResource(TestCase):
+    """
+    Tests for the hash used to identify fragment resources on the client.
+    """
+    def test_stable_hash(self):
+        # the client remembers these hashes across requests, so they must not vary between processes
+        resource = FragmentResource('text', u'alert("\u2603");', 'application/javascript', 'foot')
+        self.assertEqual(hash_resource(resource), 'a8ba949a3e996ca7ef80b5e2df6abcae')
+
+    def test_field_boundaries(self):
+        self.assertNotEqual(
+            hash_resource(FragmentResource('url', '/static/a.js', 'text/javascript', 'head')),
+            hash_resource(FragmentResource('url', '/static/a.', 'jstext/javascript', 'head')),
+        )
+
+    def test_unicode_and_bytes(self):
+        self.assertEqual(
+            hash_resource(FragmentResource('text', u'.foo {}', 'text/css', 'head')),
+            hash_resource(FragmentResource('text', '.foo {}', 'text/css', 'head')),
+        )
+
+    def test_no_mimetype(self):
+        self.assertEqual(
+            hash_resource(FragmentResource('text', 'data', None, 'head')),
+            hash_resource(FragmentResource('text', 'data', '', 'head')),
+        )
+
+
 @ddt.ddt
 class TestComponentHandler(TestCase):
     def setUp(self):
@@ -38,7 +38,9 @@ class JsonResponse(HttpResponse):
         elif isinstance(object, QuerySet):
             content = serialize('json', object)
         else:
-            content = json.dumps(object, cls=encoder, indent=2, ensure_ascii=False)
+            # no indent: pretty-printing forces json onto its pure python encoder,
+            # which is much slower on large payloads than the C one
+            content = json.dumps(object, cls=encoder, ensure_ascii=False)
         kwargs.setdefault("content_type", "application/json")
         if status:
             kwargs["status"] = status
@@ -34,6 +34,12 @@ class JsonResponseTestCase(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp["content-type"], "application/json")
 
+    def test_compact(self):
+        obj = {"foo": ["bar", {"baz": 1}]}
+        resp = JsonResponse(obj)
+        self.assertNotIn("\n", resp.content)
+        self.assertEqual(obj, json.loads(resp.content))
+
     def test_set_status_kwarg(self):
         obj = {"error": "resource not found"}
         resp = JsonResponse(obj, status=404)
@@ -323,6 +323,8 @@ class DraftModuleStore(MongoModuleStore):
             revision:
                 ModuleStoreEnum.RevisionOption.published_only - returns only Published items
                 ModuleStoreEnum.RevisionOption.draft_only - returns only Draft items
+                ModuleStoreEnum.RevisionOption.all - returns both the Draft and the Published versions
+                    of items, in a single query; use their `is_draft` attribute to tell them apart
                 None - uses the branch setting, as follows:
                     if the branch setting is ModuleStoreEnum.Branch.published_only,
                         returns only Published items
@@ -351,6 +353,11 @@ class DraftModuleStore(MongoModuleStore):
 
         if revision == ModuleStoreEnum.RevisionOption.draft_only:
             return draft_items()
+        elif revision == ModuleStoreEnum.RevisionOption.all:
+            return [
+                wrap_draft(item) for item in
+                base_get_items({'$in': [MongoRevisionKey.draft, MongoRevisionKey.published]})
+            ]
         elif revision == ModuleStoreEnum.RevisionOption.published_only \
                 or self.branch_setting_func() == ModuleStoreEnum.Branch.published_only:
             return published_items([])
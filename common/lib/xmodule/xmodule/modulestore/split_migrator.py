@@ -6,14 +6,93 @@ Exists at the top level of modulestore b/c it needs to know about and access eac
 In general, it's strategy is to treat the other modulestores as read-only and to never directly
 manipulate storage but use existing api's.
 '''
+import itertools
 import logging
 
-from xblock.fields import Reference, ReferenceList, ReferenceValueDict
+from xblock.fields import Reference, ReferenceList, ReferenceValueDict, Scope
 from xmodule.modulestore import ModuleStoreEnum
 from opaque_keys.edx.locator import CourseLocator
 
 log = logging.getLogger(__name__)
 
+# xblock fields are declared on the class, so how each field of a block has to be translated only
+# needs to be worked out once per xblock class rather than once per migrated block.
+_FIELD_CLASSIFICATION_CACHE = {}
+# the only scopes the modulestores persist: fields in any other scope (user state, preferences, etc) are never
+# set on blocks read from a modulestore, so there's no point probing them
+_MODULESTORE_SCOPES = (Scope.content, Scope.settings, Scope.children, Scope.parent)
+
+
+def _classify_fields(xblock):
+    """
+    Return the xblock's modulestore scoped fields split into (references, reference lists, reference value dicts,
+    other fields), each a list of (field_name, field) pairs.
+    """
+    xblock_class = type(xblock)
+    classification = _FIELD_CLASSIFICATION_CACHE.get(xblock_class)
+    if classification is None:
+        references, reference_lists, reference_dicts, others = classification = ([], [], [], [])
+        for field_name, field in xblock.fields.iteritems():
+            if field.scope not in _MODULESTORE_SCOPES:
+                continue
+            if isinstance(field, Reference):
+                references.append((field_name, field))
+            elif isinstance(field, ReferenceList):
+                reference_lists.append((field_name, field))
+            elif isinstance(field, ReferenceValueDict):
+                reference_dicts.append((field_name, field))
+            else:
+                others.append((field_name, field))
+        _FIELD_CLASSIFICATION_CACHE[xblock_class] = classification
+    return classification
+
+
+def _explicitly_set(xblock, fields):
+    """
+    Return the (field_name, field) pairs among fields which are explicitly set on the xblock.
+    """
+    if xblock._dirty_fields:  # pylint: disable=protected-access
+        # only Field.is_set_on knows about values which haven't been saved to the field data yet
+        return [(field_name, field) for field_name, field in fields if field.is_set_on(xblock)]
+    has = xblock._field_data.has  # pylint: disable=protected-access
+    return [(field_name, field) for field_name, field in fields if has(xblock, field_name)]
+
+
+def _version_agnostic(field, value):
+    """
+    Return the field's value w/ any locators in it stripped of their version_guid (split's blocks hold
+    references into their own structure version but the translated references don't).
+    """
+    if value is None:
+        return value
+    if isinstance(field, Reference):
+        return value.version_agnostic()
+    elif isinstance(field, ReferenceList):
+        return [reference.version_agnostic() for reference in value]
+    elif isinstance(field, ReferenceValueDict):
+        return {key: reference.version_agnostic() for key, reference in value.iteritems()}
+    return value
+
+
+def _make_translator(new_course_key, course_block_id):
+    """
+    Return a function converting an old location into its locator in new_course_key
+    """
+    make_usage_key = new_course_key.make_usage_key
+    # every reference to the course maps to the same root, whatever the old course block was named
+    course_root_key = make_usage_key('course', course_block_id) if course_block_id is not None else None
+
+    def get_translation(location):
+        """
+        Convert the location
+        """
+        category = location.category
+        if category == 'course' and course_root_key is not None:
+            return course_root_key
+        return make_usage_key(category, location.block_id if category != 'course' else course_block_id)
+
+    return get_translation
+
 
 class SplitMigrator(object):
     """
@@ -56,17 +135,30 @@ class SplitMigrator(object):
             new_org, new_course, new_run, user_id,
             fields=self._get_json_fields_translate_references(original_course, new_course_key, None),
             master_branch=ModuleStoreEnum.BranchName.published,
+            # the draft starts out as the published version; so, the published blocks added below show up in both
+            shared_branches=[ModuleStoreEnum.BranchName.draft],
         )
 
+        # read both the published and the draft versions of every element in one pass
+        published_modules = []
+        draft_modules = []
+        for module in self.source_modulestore.get_items(
+            source_course_key, revision=ModuleStoreEnum.RevisionOption.all
+        ):
+            if module.is_draft:
+                draft_modules.append(module)
+            else:
+                published_modules.append(module)
+
         with self.split_modulestore.bulk_write_operations(new_course.id):
-            self._copy_published_modules_to_course(new_course, original_course.location, source_course_key, user_id)
+            self._copy_published_modules_to_course(new_course, original_course.location, published_modules, user_id)
         # create a new version for the drafts
         with self.split_modulestore.bulk_write_operations(new_course.id):
-            self._add_draft_modules_to_course(new_course.location, source_course_key, user_id)
+            self._add_draft_modules_to_course(new_course.location, published_modules, draft_modules, user_id)
 
         return new_course.id
 
-    def _copy_published_modules_to_course(self, new_course, old_course_loc, source_course_key, user_id):
+    def _copy_published_modules_to_course(self, new_course, old_course_loc, published_modules, user_id):
         """
         Copy all of the modules from the 'direct' version of the course to the new split course.
         """
@@ -74,35 +166,31 @@ class SplitMigrator(object):
 
         # iterate over published course elements. Wildcarding rather than descending b/c some elements are orphaned (e.g.,
         # course about pages, conditionals)
-        for module in self.source_modulestore.get_items(
-            source_course_key, revision=ModuleStoreEnum.RevisionOption.published_only
-        ):
-            # don't copy the course again.
-            if module.location != old_course_loc:
-                # create split_xblock using split.create_item
-                # NOTE: the below auto populates the children when it migrates the parent; so,
-                # it doesn't need the parent as the first arg. That is, it translates and populates
-                # the 'children' field as it goes.
-                _new_module = self.split_modulestore.create_item(
-                    course_version_locator, module.category, user_id,
-                    block_id=module.location.block_id,
-                    fields=self._get_json_fields_translate_references(
+        # create all of the split_xblocks with one change to the structure using split.create_items
+        # NOTE: the below auto populates the children when it migrates the parent; so,
+        # it doesn't need the parents. That is, it translates and populates
+        # the 'children' field as it goes.
+        self.split_modulestore.create_items(
+            course_version_locator, user_id,
+            [
+                (
+                    module.category,
+                    module.location.block_id,
+                    self._get_json_fields_translate_references(
                         module, course_version_locator, new_course.location.block_id
                     ),
-                    # TODO remove continue_version when bulk write is impl'd
-                    continue_version=True
                 )
-        # after done w/ published items, add version for DRAFT pointing to the published structure
-        index_info = self.split_modulestore.get_course_index_info(course_version_locator)
-        versions = index_info['versions']
-        versions[ModuleStoreEnum.BranchName.draft] = versions[ModuleStoreEnum.BranchName.published]
-        self.split_modulestore.update_course_index(index_info)
-
+                # don't copy the course again.
+                for module in published_modules if module.location != old_course_loc
+            ],
+            # TODO remove continue_version when bulk write is impl'd
+            continue_version=True
+        )
         # clean up orphans in published version: in old mongo, parents pointed to the union of their published and draft
         # children which meant some pointers were to non-existent locations in 'direct'
         self.split_modulestore.internal_clean_children(course_version_locator)
 
-    def _add_draft_modules_to_course(self, published_course_usage_key, source_course_key, user_id):
+    def _add_draft_modules_to_course(self, published_course_usage_key, published_modules, draft_modules, user_id):
         """
         update each draft. Create any which don't exist in published and attach to their parents.
         """
@@ -112,19 +200,40 @@ class SplitMigrator(object):
         # to prevent race conditions of grandchilden being added before their parents and thus having no parent to
         # add to
         awaiting_adoption = {}
-        for module in self.source_modulestore.get_items(source_course_key, revision=ModuleStoreEnum.RevisionOption.draft_only):
+        # has_item fetches the whole course structure; so, find out which blocks exist from a single fetch of it
+        published_block_ids = self.split_modulestore.get_block_ids(new_draft_course_loc)
+        for module in draft_modules:
             new_locator = new_draft_course_loc.make_usage_key(module.category, module.location.block_id)
-            if self.split_modulestore.has_item(new_locator):
+            if new_locator.block_id in published_block_ids:
                 # was in 'direct' so draft is a new version
                 split_module = self.split_modulestore.get_item(new_locator)
                 # need to remove any no-longer-explicitly-set values and add/update any now set values.
-                for name, field in split_module.fields.iteritems():
-                    if field.is_set_on(split_module) and not module.fields[name].is_set_on(module):
-                        field.delete_from(split_module)
-                for field, value in self._get_fields_translate_references(
-                        module, new_draft_course_loc, published_course_usage_key.block_id
-                ).iteritems():
-                    field.write_to(split_module, value)
+                source_set_names = {
+                    name for fields in _classify_fields(module) for name, _field in _explicitly_set(module, fields)
+                }
+                split_set_fields = [
+                    pair for fields in _classify_fields(split_module) for pair in _explicitly_set(split_module, fields)
+                ]
+                split_set_names = {name for name, _field in split_set_fields}
+                to_delete = [field for name, field in split_set_fields if name not in source_set_names]
+                to_write = self._get_fields_translate_references(
+                    module, new_draft_course_loc, published_course_usage_key.block_id
+                )
+                split_fields = split_module.fields
+                # most drafts only differ from their published version in a few blocks; don't bother
+                # saving the ones which are the same
+                if not to_delete and all(
+                    name in split_set_names and (
+                        _version_agnostic(split_fields[name], split_fields[name].read_from(split_module)) ==
+                        _version_agnostic(split_fields[name], value)
+                    )
+                    for name, value in to_write.iteritems()
+                ):
+                    continue
+                for field in to_delete:
+                    field.delete_from(split_module)
+                for name, value in to_write.iteritems():
+                    split_fields[name].write_to(split_module, value)
 
                 _new_module = self.split_modulestore.update_item(split_module, user_id)
             else:
@@ -137,99 +246,104 @@ class SplitMigrator(object):
                     )
                 )
                 awaiting_adoption[module.location] = new_locator
+        # the source elements and each one's parent, preferring drafts as the source store's get_item and
+        # get_parent_location(revision=draft_preferred) do; so, no need to query the source for either
+        source_modules = {}
+        source_parents = {}
+        for module in itertools.chain(published_modules, draft_modules):
+            source_modules[module.location] = module
+            if module.has_children:
+                for child_loc in module.children:
+                    source_parents[child_loc] = module.location
+        # the children lists of the parents adopting drafts, each parent only gets saved once all of its
+        # adopted drafts have been placed
+        new_parent_children = {}
+        get_translation = _make_translator(new_draft_course_loc, published_course_usage_key.block_id)
         for draft_location, new_locator in awaiting_adoption.iteritems():
-            parent_loc = self.source_modulestore.get_parent_location(
-                draft_location, revision=ModuleStoreEnum.RevisionOption.draft_preferred
-            )
+            parent_loc = source_parents.get(draft_location)
             if parent_loc is None:
                 log.warn(u'No parent found in source course for %s', draft_location)
                 continue
-            old_parent = self.source_modulestore.get_item(parent_loc)
-            split_parent_loc = new_draft_course_loc.make_usage_key(
-                parent_loc.category,
-                parent_loc.block_id if parent_loc.category != 'course' else published_course_usage_key.block_id
-            )
-            new_parent = self.split_modulestore.get_item(split_parent_loc)
+            old_parent = source_modules[parent_loc]
+            split_parent_loc = get_translation(parent_loc)
+            new_children = new_parent_children.get(split_parent_loc)
+            if new_children is None:
+                new_children = self.split_modulestore.get_item(split_parent_loc).children
+                new_parent_children[split_parent_loc] = new_children
+            # position of each of new_parent's children (the first one, should a child appear twice)
+            new_child_index = {}
+            for idx, child in enumerate(new_children):
+                new_child_index.setdefault(child.version_agnostic(), idx)
             # this only occurs if the parent was also awaiting adoption: skip this one, go to next
-            if any(new_locator == child.version_agnostic() for child in new_parent.children):
+            if new_locator in new_child_index:
                 continue
             # find index for module: new_parent may be missing quite a few of old_parent's children
             new_parent_cursor = 0
             for old_child_loc in old_parent.children:
                 if old_child_loc == draft_location:
                     break  # moved cursor enough, insert it here
-                sibling_loc = new_draft_course_loc.make_usage_key(old_child_loc.category, old_child_loc.block_id)
+                sibling_loc = get_translation(old_child_loc)
                 # sibling may move cursor
-                for idx in range(new_parent_cursor, len(new_parent.children)):
-                    if new_parent.children[idx].version_agnostic() == sibling_loc:
-                        new_parent_cursor = idx + 1
-                        break  # skipped sibs enough, pick back up scan
-            new_parent.children.insert(new_parent_cursor, new_locator)
-            new_parent = self.split_modulestore.update_item(new_parent, user_id)
+                idx = new_child_index.get(sibling_loc)
+                if idx is not None and idx >= new_parent_cursor:
+                    new_parent_cursor = idx + 1
+            new_children.insert(new_parent_cursor, new_locator)
+        for split_parent_loc, new_children in new_parent_children.iteritems():
+            # refetch as each save moves the course to a new version
+            new_parent = self.split_modulestore.get_item(split_parent_loc)
+            new_parent.children = new_children
+            self.split_modulestore.update_item(new_parent, user_id)
 
     def _get_json_fields_translate_references(self, xblock, new_course_key, course_block_id):
         """
         Return the json repr for explicitly set fields but convert all references to their Locators
         """
-        def get_translation(location):
-            """
-            Convert the location
-            """
-            return new_course_key.make_usage_key(
-                location.category,
-                location.block_id if location.category != 'course' else course_block_id
-            )
-
+        get_translation = _make_translator(new_course_key, course_block_id)
+        # find the set fields before reading any values, as reading a mutable field marks it dirty
+        references, reference_lists, reference_dicts, others = [
+            _explicitly_set(xblock, fields) for fields in _classify_fields(xblock)
+        ]
         result = {}
-        for field_name, field in xblock.fields.iteritems():
-            if field.is_set_on(xblock):
-                field_value = getattr(xblock, field_name)
-                if isinstance(field, Reference) and field_value is not None:
-                    result[field_name] = get_translation(field_value)
-                elif isinstance(field, ReferenceList):
-                    result[field_name] = [
-                        get_translation(ele) for ele in field_value
-                    ]
-                elif isinstance(field, ReferenceValueDict):
-                    result[field_name] = {
-                        key: get_translation(subvalue)
-                        for key, subvalue in field_value.iteritems()
-                    }
-                else:
-                    result[field_name] = field.read_json(xblock)
+        for field_name, field in references:
+            field_value = getattr(xblock, field_name)
+            if field_value is not None:
+                result[field_name] = get_translation(field_value)
+            else:
+                result[field_name] = field.read_json(xblock)
+        for field_name, _field in reference_lists:
+            result[field_name] = map(get_translation, getattr(xblock, field_name))
+        for field_name, _field in reference_dicts:
+            result[field_name] = {
+                key: get_translation(subvalue)
+                for key, subvalue in getattr(xblock, field_name).iteritems()
+            }
+        for field_name, field in others:
+            result[field_name] = field.read_json(xblock)
 
         return result
 
     def _get_fields_translate_references(self, xblock, new_course_key, course_block_id):
         """
-        Return a dictionary of field: value pairs for explicitly set fields
+        Return a dictionary of field_name: value pairs for explicitly set fields
         but convert all references to their BlockUsageLocators
         """
-        def get_translation(location):
-            """
-            Convert the location
-            """
-            return new_course_key.make_usage_key(
-                location.category,
-                location.block_id if location.category != 'course' else course_block_id
-            )
-
+        get_translation = _make_translator(new_course_key, course_block_id)
+        # find the set fields before reading any values, as reading a mutable field marks it dirty
+        references, reference_lists, reference_dicts, others = [
+            _explicitly_set(xblock, fields) for fields in _classify_fields(xblock)
+        ]
         result = {}
-        for field_name, field in xblock.fields.iteritems():
-            if field.is_set_on(xblock):
-                field_value = getattr(xblock, field_name)
-                if isinstance(field, Reference) and field_value is not None:
-                    result[field] = get_translation(field_value)
-                elif isinstance(field, ReferenceList):
-                    result[field] = [
-                        get_translation(ele) for ele in field_value
-                    ]
-                elif isinstance(field, ReferenceValueDict):
-                    result[field] = {
-                        key: get_translation(subvalue)
-                        for key, subvalue in field_value.iteritems()
-                    }
-                else:
-                    result[field] = field_value
+        for field_name, _field in references:
+            field_value = getattr(xblock, field_name)
+            result[field_name] = get_translation(field_value) if field_value is not None else None
+        for field_name, _field in reference_lists:
+            result[field_name] = map(get_translation, getattr(xblock, field_name))
+        for field_name, _field in reference_dicts:
+            result[field_name] = {
+                key: get_translation(subvalue)
+                for key, subvalue in getattr(xblock, field_name).iteritems()
+            }
+        for field_name, _field in others:
+            result[field_name] = getattr(xblock, field_name)
 
         return result
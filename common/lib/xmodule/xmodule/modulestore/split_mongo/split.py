@@ -265,7 +265,9 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param course_version_guid: if provided, clear only this entry
         """
         if course_version_guid:
-            del self.thread_cache.course_cache[course_version_guid]
+            # a multistep change (e.g., create_items followed by internal_clean_children) may clear the same
+            # version more than once w/o anything reloading it in between
+            self.thread_cache.course_cache.pop(course_version_guid, None)
         else:
             self.thread_cache.course_cache = {}
 
@@ -415,6 +417,17 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         return self._get_block_from_structure(course_structure, usage_key.block_id) is not None
 
+    def get_block_ids(self, course_locator):
+        """
+        Returns the set of the block_ids of all of the blocks in the given version of the course. Cheaper
+        than has_item for checking many blocks as it only fetches the course structure once, and than
+        get_items as it doesn't load any xblocks.
+
+        raises ItemNotFoundError if the course does not exist
+        """
+        course_structure = self._lookup_course(course_locator)['structure']
+        return {decode_key_from_mongo(block_id) for block_id in course_structure['blocks']}
+
     def has_changes(self, usage_key):
         """
         Checks if the given block has unpublished changes
@@ -847,29 +860,9 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         new_id = new_structure['_id']
 
-        # generate usage id
-        if block_id is not None:
-            if encode_key_for_mongo(block_id) in new_structure['blocks']:
-                raise DuplicateItemError(block_id, self, 'structures')
-            else:
-                new_block_id = block_id
-        else:
-            new_block_id = self._generate_block_id(new_structure['blocks'], category)
-
-        block_fields = partitioned_fields.get(Scope.settings, {})
-        if Scope.children in partitioned_fields:
-            block_fields.update(partitioned_fields[Scope.children])
-        self._update_block_in_structure(new_structure, new_block_id, {
-            "category": category,
-            "definition": definition_locator.definition_id,
-            "fields": self._serialize_fields(category, block_fields),
-            'edit_info': {
-                'edited_on': datetime.datetime.now(UTC),
-                'edited_by': user_id,
-                'previous_version': None,
-                'update_version': new_id,
-            }
-        })
+        new_block_id = self._add_new_block_to_structure(
+            new_structure, category, block_id, definition_locator.definition_id, partitioned_fields, user_id
+        )
 
         # if given parent, add new block as child and update parent's version
         parent = None
@@ -909,6 +902,111 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         # reconstruct the new_item from the cache
         return self.get_item(item_loc)
 
+    def create_items(self, course_locator, user_id, items, force=False, continue_version=False):
+        """
+        Add several descriptors to persistence at once as elements of the course: this makes one change to
+        the course structure for the whole batch rather than one per descriptor as create_item does. Returns
+        the BlockUsageLocators of the new blocks in the order of items.
+
+        Unlike create_item, this doesn't add the new blocks to any parent, set the parents' and new blocks'
+        children in their fields instead (children may refer to blocks created later in the same batch).
+
+        :param course_locator: the CourseLocator of the course to add to. See create_item for the rules
+        about its version_guid, force, and continue_version.
+        :param items: a list of (category, block_id, fields) triples. Each block_id, if not None, must not
+        already exist in the structure nor appear more than once in items; otherwise, one is computed from the
+        category. Each block gets a new definition made from the Scope.content values in its fields.
+
+        raises DuplicateItemError if any of the block_ids is already in use. All of the block_ids get checked
+        before anything is changed; so, on this error, nothing has been written.
+        """
+        # find course_index entry if applicable and structures entry
+        index_entry = self._get_index_if_valid(course_locator, force, continue_version)
+        structure = self._lookup_course(course_locator)['structure']
+
+        # settle all of the block_ids before creating any definitions or touching the structure
+        used_block_ids = set(structure['blocks'])
+        for _category, block_id, _fields in items:
+            if block_id is not None:
+                encoded_block_id = encode_key_for_mongo(block_id)
+                if encoded_block_id in used_block_ids:
+                    raise DuplicateItemError(block_id, self, 'structures')
+                used_block_ids.add(encoded_block_id)
+        new_items = []
+        for category, block_id, fields in items:
+            if block_id is None:
+                block_id = self._generate_block_id(used_block_ids, category)
+                used_block_ids.add(block_id)
+            new_items.append((category, block_id, fields))
+
+        # copy the structure and modify the new one
+        if continue_version:
+            new_structure = structure
+        else:
+            new_structure = self._version_structure(structure, user_id)
+
+        new_id = new_structure['_id']
+        if index_entry is not None:
+            item_course_key = course_locator.version_agnostic()
+        else:
+            item_course_key = CourseLocator(version_guid=new_id)
+
+        item_locs = []
+        for category, block_id, fields in new_items:
+            partitioned_fields = self.partition_fields_by_scope(category, fields)
+            definition_locator = self.create_definition_from_data(
+                partitioned_fields.get(Scope.content, {}), category, user_id
+            )
+            new_block_id = self._add_new_block_to_structure(
+                new_structure, category, block_id, definition_locator.definition_id, partitioned_fields, user_id
+            )
+            item_locs.append(BlockUsageLocator(item_course_key, block_type=category, block_id=new_block_id))
+
+        if continue_version:
+            # db update
+            self.db_connection.update_structure(new_structure)
+            # clear cache so things get refetched and inheritance recomputed
+            self._clear_cache(new_id)
+        else:
+            self.db_connection.insert_structure(new_structure)
+
+        # update the index entry if appropriate
+        if index_entry is not None and not continue_version:
+            self._update_head(index_entry, course_locator.branch, new_id)
+        return item_locs
+
+    def _add_new_block_to_structure(self, structure, category, block_id, definition_id, partitioned_fields, user_id):
+        """
+        Insert a new block for the definition into the structure (w/o adding it to any parent) and return its
+        block_id. Generates the block_id from the category if block_id is None.
+
+        raises DuplicateItemError if the block_id already exists in the structure.
+        """
+        # generate usage id
+        if block_id is not None:
+            if encode_key_for_mongo(block_id) in structure['blocks']:
+                raise DuplicateItemError(block_id, self, 'structures')
+            else:
+                new_block_id = block_id
+        else:
+            new_block_id = self._generate_block_id(structure['blocks'], category)
+
+        block_fields = partitioned_fields.get(Scope.settings, {})
+        if Scope.children in partitioned_fields:
+            block_fields.update(partitioned_fields[Scope.children])
+        self._update_block_in_structure(structure, new_block_id, {
+            "category": category,
+            "definition": definition_id,
+            "fields": self._serialize_fields(category, block_fields),
+            'edit_info': {
+                'edited_on': datetime.datetime.now(UTC),
+                'edited_by': user_id,
+                'previous_version': None,
+                'update_version': structure['_id'],
+            }
+        })
+        return new_block_id
+
     def clone_course(self, source_course_id, dest_course_id, user_id):
         """
         See :meth: `.ModuleStoreWrite.clone_course` for documentation.
@@ -927,7 +1025,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         self, org, course, run, user_id, fields=None,
         master_branch=ModuleStoreEnum.BranchName.draft,
         versions_dict=None, root_category='course',
-        root_block_id='course', **kwargs
+        root_block_id='course', shared_branches=None, **kwargs
     ):
         """
         Create a new entry in the active courses index which points to an existing or new structure. Returns
@@ -967,6 +1065,9 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         and the values are structure guids. If provided, the new course will reuse this version (unless you also
         provide any fields overrides, see above). if not provided, will create a mostly empty course
         structure with just a category course root xblock.
+
+        shared_branches: (optional) the tags of any other branches which should start out pointing to the same
+        version as the master_branch (e.g., to make the DRAFT and PUBLISHED branches identical).
         """
         # check course and run's uniqueness
         locator = CourseLocator(org=org, course=course, run=run, branch=master_branch)
@@ -1040,6 +1141,9 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 self.db_connection.insert_structure(draft_structure)
                 versions_dict[master_branch] = new_id
 
+        for branch in shared_branches or []:
+            versions_dict[branch] = versions_dict[master_branch]
+
         index_entry = {
             '_id': ObjectId(),
             'org': org,
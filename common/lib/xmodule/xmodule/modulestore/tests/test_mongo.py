@@ -534,6 +534,31 @@ class TestMongoModuleStore(unittest.TestCase):
         self.draft_store.publish(location, self.dummy_user)
         self.assertFalse(self.draft_store.has_changes(location))
 
+    def test_get_items_all_revisions(self):
+        """
+        Tests that get_items(revision=all) returns both the draft and the published version of an item
+        """
+        location = Location('edX', 'revisions', '2012_Fall', 'vertical', 'test_vertical')
+
+        # Create a published component and then a changed draft of it
+        self.draft_store.create_and_save_xmodule(
+            location, user_id=self.dummy_user, metadata={'display_name': 'Published'}
+        )
+        self.draft_store.publish(location, self.dummy_user)
+        component = self.draft_store.get_item(location)
+        component.display_name = 'Draft'
+        self.draft_store.update_item(component, self.dummy_user)
+
+        items = self.draft_store.get_items(location.course_key, revision=ModuleStoreEnum.RevisionOption.all)
+        self.assertEqual(len(items), 2)
+        draft = next(item for item in items if item.is_draft)
+        published = next(item for item in items if not item.is_draft)
+        self.assertEqual(draft.display_name, 'Draft')
+        self.assertEqual(published.display_name, 'Published')
+        # neither discloses its revision
+        self.assertEqual(draft.location, location)
+        self.assertEqual(published.location, location)
+
     def test_has_changes_missing_child(self):
         """
         Tests that has_changes() returns False when a published parent points to a child that doesn't exist.
@@ -6,6 +6,7 @@ import uuid
 import random
 import mock
 from xblock.fields import Reference, ReferenceList, ReferenceValueDict
+from xmodule.modulestore import ModuleStoreEnum
 from xmodule.modulestore.split_migrator import SplitMigrator
 from xmodule.modulestore.tests.test_split_w_old_mongo import SplitWMongoCourseBoostrapper
 
@@ -187,3 +188,31 @@ class TestMigration(SplitWMongoCourseBoostrapper):
         # now compare the migrated to the original course
         self.compare_courses(self.draft_mongo, new_course_key, True)  # published
         self.compare_courses(self.draft_mongo, new_course_key, False)  # draft
+
+    def test_unchanged_draft(self):
+        """
+        A draft which is the same as its published version shouldn't make a new draft version in split
+        """
+        old_course = self.draft_mongo.create_course('test_org', 'unchanged_draft', 'runid', self.user_id)
+        self.old_course_key = old_course.id
+        self.runtime = old_course.runtime
+        chapter_name = uuid.uuid4().hex
+        self._create_item('chapter', chapter_name, {}, {'display_name': 'Chapter'}, 'course', 'runid', split=False)
+        vertical_loc = self.old_course_key.make_usage_key('vertical', uuid.uuid4().hex)
+        self._create_item(
+            vertical_loc.category, vertical_loc.name, {}, {'display_name': 'Vertical'}, 'chapter', chapter_name,
+            draft=False, split=False
+        )
+        self._create_item(
+            'html', uuid.uuid4().hex, {'data': '<p>unchanged</p>'}, {'display_name': 'Unit'},
+            vertical_loc.category, vertical_loc.name, draft=False, split=False
+        )
+        # draft w/o any changes (the vertical has children; so, is compared on references too)
+        self.draft_mongo.convert_to_draft(vertical_loc, self.user_id)
+        self.assertTrue(
+            self.draft_mongo.get_items(self.old_course_key, revision=ModuleStoreEnum.RevisionOption.draft_only)
+        )
+
+        new_course_key = self.migrator.migrate_mongo_course(self.old_course_key, self.user_id, new_run='new_run')
+        versions = self.split_mongo.get_course_index_info(new_course_key)['versions']
+        self.assertEqual(versions[ModuleStoreEnum.BranchName.draft], versions[ModuleStoreEnum.BranchName.published])
@@ -770,6 +770,22 @@ class SplitModuleItemTests(SplitModuleTest):
             modulestore().has_item(locator.for_branch(BRANCH_NAME_PUBLISHED))
         )
 
+    def test_get_block_ids(self):
+        """
+        get_block_ids(CourseLocator)
+        """
+        course_locator = CourseLocator(org='testx', course='GreekHero', run='run', branch=BRANCH_NAME_DRAFT)
+        block_ids = modulestore().get_block_ids(course_locator)
+        self.assertIn('head12345', block_ids)
+        self.assertIn('chapter1', block_ids)
+        self.assertIn('problem3_2', block_ids)
+        self.assertNotIn('head23456', block_ids)
+
+        with self.assertRaises(ItemNotFoundError):
+            modulestore().get_block_ids(
+                CourseLocator(org='foo', course='doesnotexist', run='run', branch=BRANCH_NAME_DRAFT)
+            )
+
     def test_negative_has_item(self):
         # negative tests--not found
         # no such course or block
@@ -1213,6 +1229,96 @@ class TestItemCrud(SplitModuleTest):
         self.assertEqual(refetch_course.previous_version, course_block_update_version)
         self.assertEqual(refetch_course.update_version, transaction_guid)
 
+    def test_create_items(self):
+        """
+        Test create_items makes all of the blocks in one version w/o parenting them
+        """
+        user = random.getrandbits(32)
+        new_course = modulestore().create_course('test_org', 'test_create_items', 'test_run', user)
+        versionless_course_locator = new_course.id.version_agnostic()
+        chapter_locator = versionless_course_locator.make_usage_key('chapter', 'chapter1')
+        sequential_locator = versionless_course_locator.make_usage_key('sequential', 'seq1')
+
+        item_locs = modulestore().create_items(
+            new_course.id, user,
+            [
+                ('chapter', 'chapter1', {'display_name': 'chapter 1', 'children': [sequential_locator]}),
+                ('sequential', 'seq1', {'display_name': 'sequence 1'}),
+                ('html', None, {'data': '<p>orphan</p>'}),
+            ]
+        )
+        self.assertEqual(item_locs[:2], [chapter_locator, sequential_locator])
+        self.assertEqual(item_locs[2].block_type, 'html')
+
+        # all in one new version
+        refetch_course = modulestore().get_course(versionless_course_locator)
+        self.assertNotEqual(refetch_course.location.version_guid, new_course.location.version_guid)
+        history_info = modulestore().get_course_history_info(refetch_course.location)
+        self.assertEqual(history_info['previous_version'], new_course.location.version_guid)
+        # not added to the course
+        self.assertEqual(refetch_course.children, [])
+
+        chapter = modulestore().get_item(chapter_locator)
+        self.assertEqual(chapter.display_name, 'chapter 1')
+        self.assertEqual(version_agnostic(chapter.children), [sequential_locator])
+        self.assertEqual(modulestore().get_item(item_locs[2]).data, '<p>orphan</p>')
+
+        # duplicate in the structure
+        with self.assertRaises(DuplicateItemError):
+            modulestore().create_items(
+                versionless_course_locator, user, [('chapter', 'chapter1', {'display_name': 'chapter 2'})]
+            )
+        # duplicate w/in the batch: checked before anything gets written
+        with self.assertRaises(DuplicateItemError):
+            modulestore().create_items(
+                versionless_course_locator, user,
+                [
+                    ('chapter', 'chapter2', {'display_name': 'chapter 2'}),
+                    ('chapter', 'chapter2', {'display_name': 'chapter 3'}),
+                ]
+            )
+        self.assertEqual(
+            modulestore().get_course(versionless_course_locator).location.version_guid,
+            refetch_course.location.version_guid
+        )
+        with self.assertRaises(ItemNotFoundError):
+            modulestore().get_item(versionless_course_locator.make_usage_key('chapter', 'chapter2'))
+
+    def test_create_items_continue_version(self):
+        """
+        Test create_items adding to the current version as the split migrator does
+        """
+        user = random.getrandbits(32)
+        new_course = modulestore().create_course('test_org', 'test_create_items_cv', 'test_run', user)
+        versionless_course_locator = new_course.id.version_agnostic()
+
+        item_locs = modulestore().create_items(
+            new_course.id, user,
+            [
+                ('chapter', None, {'display_name': 'chapter 1'}),
+                ('chapter', None, {'display_name': 'chapter 2'}),
+            ],
+            continue_version=True
+        )
+        self.assertEqual(len(set(item_locs)), 2)
+        # version info shouldn't change
+        refetch_course = modulestore().get_course(versionless_course_locator)
+        self.assertEqual(refetch_course.location.version_guid, new_course.location.version_guid)
+        self.assertEqual(refetch_course.update_version, new_course.update_version)
+        new_ele = modulestore().get_item(item_locs[0])
+        self.assertEqual(new_ele.display_name, 'chapter 1')
+        self.assertEqual(new_ele.update_version, new_course.location.version_guid)
+
+        # continuing the same change w/o reloading the course in between
+        modulestore().create_items(
+            new_course.id, user, [('chapter', 'chapter3', {'display_name': 'chapter 3'})], continue_version=True
+        )
+        modulestore().internal_clean_children(new_course.id)
+        self.assertEqual(
+            modulestore().get_item(versionless_course_locator.make_usage_key('chapter', 'chapter3')).display_name,
+            'chapter 3'
+        )
+
     def test_update_metadata(self):
         """
         test updating an items metadata ensuring the definition doesn't version but the course does if it should
@@ -1534,6 +1640,19 @@ class TestCourseCreation(SplitModuleTest):
         course = modulestore().get_course(locator.for_branch(BRANCH_NAME_PUBLISHED))
         self.assertEqual(course.location.version_guid, versions[BRANCH_NAME_DRAFT])
 
+    def test_shared_branches(self):
+        """
+        Test creating a course whose other branches start out at the master branch's version
+        """
+        new_course = modulestore().create_course(
+            'test_org', 'test_shared', 'test_run', 'create_user',
+            master_branch=BRANCH_NAME_PUBLISHED, shared_branches=[BRANCH_NAME_DRAFT]
+        )
+        versions = modulestore().get_course_index_info(new_course.location)['versions']
+        self.assertEqual(versions[BRANCH_NAME_DRAFT], versions[BRANCH_NAME_PUBLISHED])
+        draft_course = modulestore().get_course(new_course.id.for_branch(BRANCH_NAME_DRAFT).version_agnostic())
+        self.assertEqual(draft_course.location.version_guid, new_course.location.version_guid)
+
     def test_create_with_root(self):
         """
         Test create_course with a specified root id and category